@@ -1,17 +1,151 @@
-import json
+import mmap
+import orjson
 import re
+import time
+
+# yajl2_c e' il backend ijson piu' veloce; fallback al backend di default
+try:
+    import ijson.backends.yajl2_c as ijson
+except ImportError:
+    import ijson
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Set, Any
 from groq import Groq
 import logging
-from fuzzywuzzy import fuzz
-from collections import defaultdict
+import numpy as np
+from numba import njit, prange
+from rapidfuzz import fuzz, process
+from collections import defaultdict, Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 import os
 
+# Tabella di escape per il corpo RTF (estendibile se servono altri caratteri)
+_RTF_TRANSLATE = str.maketrans({'\n': '\\par '})
+
+# Caratteri da rimuovere dai nomi file generati
+_FILENAME_RE = re.compile(r'[^\w\s-]')
+
+# Dimensioni/TTL delle cache in-process delle ricerche
+_SEARCH_CACHE_SIZE = 512
+_ANSWER_CACHE_SIZE = 128
+_ANSWER_CACHE_TTL = 300.0  # secondi
+
 # Configurazione logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+# Unici campi letti da ricerca, statistiche e prompt: tutto il resto
+# (markdown, link interni, debug) non viene materializzato in memoria
+_ITEM_KEYS = ('url', 'title', 'description', 'keywords', 'main_topics',
+              'content_type', 'language', 'relevance_score',
+              'content_quality', 'sentiment', 'target_audience')
+
+
+def _project(obj: Dict) -> Dict:
+    """Proietta un item dell'indice sui soli campi usati dall'applicazione"""
+    return {k: obj[k] for k in _ITEM_KEYS if k in obj}
+
+
+# Campi di un risultato inoltrati tali e quali nel prompt per l'AI
+_PROMPT_KEYS = ('url', 'title', 'content_type', 'main_topics')
+
+
+def _text_trigrams(text: str) -> Set[str]:
+    """Restituisce l'insieme dei trigrammi di caratteri di un testo"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# Bloom bitset dei bigrammi di caratteri: 4 parole da 64 bit = 256 bucket
+_BITSET_WORDS = 4
+
+
+def _fill_bigram_bits(bits: np.ndarray, text: str):
+    """Accende nel bitset i bucket dei bigrammi di caratteri del testo"""
+    for i in range(len(text) - 1):
+        h = hash(text[i:i + 2]) & 255
+        bits[h >> 6] |= np.uint64(1) << np.uint64(h & 63)
+
+
+@njit(parallel=True, cache=True)
+def _bigram_overlap_counts(bitsets, query_bits):
+    """
+    Conta per ogni item quanti bucket di bigrammi condivide con la query
+    (AND + popcount sui bitset), parallelizzato sugli item con prange
+    """
+    n = bitsets.shape[0]
+    out = np.zeros(n, dtype=np.int64)
+    for i in prange(n):
+        count = 0
+        for w in range(bitsets.shape[1]):
+            v = bitsets[i, w] & query_bits[w]
+            while v:
+                v &= v - np.uint64(1)
+                count += 1
+        out[i] = count
+    return out
+
+
+def convert_index_to_jsonl(json_path: str, jsonl_path: Optional[str] = None) -> str:
+    """
+    Conversione una tantum dell'indice da array JSON a JSON Lines
+    (un item per riga), per permettere il caricamento lazy via mmap
+
+    Args:
+        json_path: Percorso del file JSON di origine
+        jsonl_path: Percorso di destinazione (default: stesso nome con .jsonl)
+
+    Returns:
+        Percorso del file JSONL creato
+    """
+    jsonl_path = jsonl_path or json_path.rsplit('.json', 1)[0] + '.jsonl'
+    with open(json_path, 'rb') as src, open(jsonl_path, 'wb') as dst:
+        # use_float: ijson di default produce decimal.Decimal per i float
+        # JSON, che orjson (e json) non sanno serializzare
+        for obj in ijson.items(src, 'item', use_float=True):
+            dst.write(orjson.dumps(obj))
+            dst.write(b'\n')
+    return jsonl_path
+
+
+class _LazyJsonLines:
+    """
+    Sequenza read-only su un file JSON Lines mappato in memoria: tiene
+    in RAM solo la tabella degli offset di riga (8 byte per item) e
+    decodifica ogni item on demand con orjson
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._size = len(self._mm)
+        offsets = [0]
+        pos = self._mm.find(b'\n')
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = self._mm.find(b'\n', pos + 1)
+        # Scarta l'offset oltre la fine (file terminato da newline)
+        if offsets[-1] >= self._size:
+            offsets.pop()
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, i):
+        start = self._offsets[i]
+        if i + 1 < len(self._offsets):
+            end = self._offsets[i + 1] - 1
+        else:
+            end = self._size
+        return _project(orjson.loads(self._mm[start:end]))
+
+    def __iter__(self):
+        for i in range(len(self._offsets)):
+            yield self[i]
+
+
 class SearchBot:
     def __init__(self, groq_api_key: str, json_file_path: str):
         """
@@ -24,78 +158,289 @@ class SearchBot:
         self.groq_client = Groq(api_key=groq_api_key)
         self.json_file_path = json_file_path
         self.indexed_data = []
+        # Pool per lo scoring concorrente dei campi: rapidfuzz rilascia
+        # il GIL durante il calcolo, quindi i thread scalano davvero
+        self._pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4,
+                                        thread_name_prefix='score')
         self.load_json_data()
     
     def load_json_data(self):
         """
         Carica i dati dal file JSON
         """
+        # Le cache vengono (re)inizializzate ad ogni caricamento: i risultati
+        # memorizzati si riferiscono al contenuto dell'indice corrente
+        self._search_cache = OrderedDict()
+        self._answer_cache = OrderedDict()
+        # Le statistiche sono immutabili tra un reload e l'altro:
+        # calcolate al massimo una volta
+        self._stats_cache = None
         try:
-            with open(self.json_file_path, 'r', encoding='utf-8') as f:
-                self.indexed_data = json.load(f)
-            logger.info(f"Caricati {len(self.indexed_data)} elementi dal file JSON")
+            # Se esiste la versione JSON Lines dell'indice, mappala in memoria
+            # e decodifica gli item solo on demand (vedi convert_index_to_jsonl)
+            jsonl_path = self.json_file_path.rsplit('.json', 1)[0] + '.jsonl'
+            if os.path.exists(jsonl_path) and os.path.getsize(jsonl_path) > 0:
+                self.indexed_data = _LazyJsonLines(jsonl_path)
+                logger.info(f"Indice JSONL mappato: {len(self.indexed_data)} elementi (lazy)")
+            else:
+                # Parsing in streaming: un item alla volta, proiettato sui soli
+                # campi usati, senza mai costruire l'intero documento in memoria
+                with open(self.json_file_path, 'rb') as f:
+                    # use_float: senza, relevance_score arriverebbe come
+                    # decimal.Decimal e romperebbe la serializzazione orjson
+                    self.indexed_data = [_project(obj) for obj in ijson.items(f, 'item', use_float=True)]
+                logger.info(f"Caricati {len(self.indexed_data)} elementi dal file JSON")
         except Exception as e:
             logger.error(f"Errore nel caricare il file JSON: {str(e)}")
             self.indexed_data = []
-    
-    def search_by_keywords(self, query: str, threshold: int = 70) -> List[Dict]:
+        self._build_search_arrays()
+
+    def _build_search_arrays(self):
+        """
+        Costruisce gli array piatti (corpus + indice dell'item proprietario)
+        usati da rapidfuzz.process.cdist per lo scoring vettorizzato.
+        I corpus vengono normalizzati (lowercase) una volta sola qui, cosi'
+        lo scoring puo' girare con processor=None senza ri-normalizzare
+        """
+        kw_corpus, kw_raw, kw_owner = [], [], []
+        desc_corpus, desc_raw, desc_owner = [], [], []
+        title_corpus, title_raw, title_owner = [], [], []
+        topic_corpus, topic_raw, topic_owner = [], [], []
+
+        # Trigrammi per descrizione: prefiltro che evita il fuzzy sulle
+        # descrizioni lunghe senza alcun trigramma in comune con la query
+        desc_trigram_sets = []
+
+        # Indice inverso: token -> item ids (match esatti) e
+        # trigramma -> item ids (generazione candidati per il fuzzy)
+        kw_postings = defaultdict(list)
+        trigram_index = defaultdict(set)
+
+        # Bloom bitset dei bigrammi per item, usato come prefiltro JIT
+        bigram_bitsets = np.zeros((len(self.indexed_data), _BITSET_WORDS), dtype=np.uint64)
+
+        for idx, item in enumerate(self.indexed_data):
+            for keyword in item.get('keywords', []):
+                kw_lc = keyword.lower()
+                kw_corpus.append(kw_lc)
+                kw_raw.append(keyword)
+                kw_owner.append(idx)
+                for token in kw_lc.split():
+                    kw_postings[token].append(idx)
+                for trigram in _text_trigrams(kw_lc):
+                    trigram_index[trigram].add(idx)
+                _fill_bigram_bits(bigram_bitsets[idx], kw_lc)
+            description = item.get('description', '')
+            if description:
+                desc_lc = description.lower()
+                desc_corpus.append(desc_lc)
+                desc_raw.append(description)
+                desc_owner.append(idx)
+                desc_trigram_sets.append(frozenset(_text_trigrams(desc_lc)))
+                for trigram in _text_trigrams(desc_lc):
+                    trigram_index[trigram].add(idx)
+                _fill_bigram_bits(bigram_bitsets[idx], desc_lc)
+            title = item.get('title', '')
+            if title:
+                title_lc = title.lower()
+                title_corpus.append(title_lc)
+                title_raw.append(title)
+                title_owner.append(idx)
+                for trigram in _text_trigrams(title_lc):
+                    trigram_index[trigram].add(idx)
+                _fill_bigram_bits(bigram_bitsets[idx], title_lc)
+            for topic in item.get('main_topics', []):
+                topic_lc = topic.lower()
+                topic_corpus.append(topic_lc)
+                topic_raw.append(topic)
+                topic_owner.append(idx)
+                for trigram in _text_trigrams(topic_lc):
+                    trigram_index[trigram].add(idx)
+                _fill_bigram_bits(bigram_bitsets[idx], topic_lc)
+
+        self._kw_postings = dict(kw_postings)
+        self._trigrams = dict(trigram_index)
+        self._bigram_bitsets = bigram_bitsets
+        self._desc_trigram_sets = desc_trigram_sets
+
+        # (corpus normalizzato, testo originale, owner, scorer, peso, etichetta match).
+        # token_set_ratio e' lo scorer piu' robusto su testo rumoroso e con
+        # score_cutoff stretto rapidfuzz abbandona le righe della DP appena
+        # il bound scende sotto la soglia
+        self._search_fields = (
+            (kw_corpus, kw_raw, np.asarray(kw_owner, dtype=np.intp), fuzz.token_set_ratio, 2.0, 'keyword'),
+            (desc_corpus, desc_raw, np.asarray(desc_owner, dtype=np.intp), fuzz.token_set_ratio, 1.0, 'description'),
+            (title_corpus, title_raw, np.asarray(title_owner, dtype=np.intp), fuzz.token_set_ratio, 1.5, 'title'),
+            (topic_corpus, topic_raw, np.asarray(topic_owner, dtype=np.intp), fuzz.token_set_ratio, 1.2, 'topic'),
+        )
+
+    def search_by_keywords(self, query: str, threshold: int = 70,
+                           max_results: Optional[int] = None) -> List[Dict]:
         """
         Cerca nei dati usando le parole chiave
-        
+
         Args:
             query: Query di ricerca
             threshold: Soglia di similarità (0-100)
-            
+            max_results: Se indicato, restituisce solo i migliori k risultati
+
         Returns:
             Lista di risultati ordinati per rilevanza
         """
+        query_lower = query.lower().strip()
+        cache_key = (query_lower, threshold, max_results)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            self._search_cache.move_to_end(cache_key)
+            return list(cached)
+
+        results = self._score_query(query_lower, threshold, max_results)
+
+        self._search_cache[cache_key] = results
+        if len(self._search_cache) > _SEARCH_CACHE_SIZE:
+            self._search_cache.popitem(last=False)
+        return list(results)
+
+    def _score_query(self, query_lower: str, threshold: int,
+                     max_results: Optional[int] = None) -> List[Dict]:
+        """
+        Esegue lo scoring fuzzy vero e proprio (senza cache)
+        """
+        n_items = len(self.indexed_data)
+        if n_items == 0:
+            return []
+
+        if len(query_lower) >= 3:
+            # Pruning dei candidati: solo gli item che condividono un token
+            # (posting list) o almeno un trigramma con la query vengono passati
+            # allo scoring fuzzy; gli altri non possono superare la soglia
+            candidates = set()
+            for token in query_lower.split():
+                candidates.update(self._kw_postings.get(token, ()))
+            for trigram in _text_trigrams(query_lower):
+                candidates.update(self._trigrams.get(trigram, ()))
+            if not candidates:
+                return []
+            candidate_ids = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+
+            # Prefiltro JIT: scarta i candidati che non condividono nemmeno un
+            # bucket di bigrammi con la query (AND+popcount in parallelo)
+            query_bits = np.zeros(_BITSET_WORDS, dtype=np.uint64)
+            _fill_bigram_bits(query_bits, query_lower)
+            overlap = _bigram_overlap_counts(self._bigram_bitsets, query_bits)
+            candidate_ids = candidate_ids[overlap[candidate_ids] > 0]
+            if candidate_ids.size == 0:
+                return []
+        else:
+            # Query sotto la dimensione del trigramma: niente n-grammi da
+            # cui generare candidati, quindi i prefiltri azzererebbero
+            # match legittimi (es. "ai"). Si valuta l'intero corpus, come
+            # faceva lo scoring di base
+            candidate_ids = np.arange(n_items, dtype=np.intp)
+
+        # Accumula i punteggi per item in un array invece che in dict copiati;
+        # i match testuali vengono solo registrati qui e materializzati dopo
+        # la selezione top-k, cosi' gli item scartati non costano stringhe.
+        # I quattro campi vengono valutati in parallelo sul thread pool
+        scores = np.zeros(n_items, dtype=np.float64)
+        field_hits = []
+
+        futures = [
+            self._pool.submit(self._score_field, query_lower, threshold,
+                              field, candidate_ids, n_items)
+            for field in self._search_fields
+        ]
+        for future in futures:
+            scored = future.result()
+            if scored is None:
+                continue
+            label, hits, row_hits, raw, owner, weight = scored
+            np.add.at(scores, owner[hits], row_hits * weight)
+            field_hits.append((label, hits, raw, owner))
+
+        # Materializza le copie solo per gli item con punteggio > 0;
+        # per k << R la selezione top-k via argpartition evita il sort completo
+        hit_ids = np.nonzero(scores)[0]
+        if max_results is not None and max_results < hit_ids.size:
+            top = hit_ids[np.argpartition(-scores[hit_ids], max_results - 1)[:max_results]]
+            order = top[np.argsort(-scores[top])]
+        else:
+            order = hit_ids[np.argsort(-scores[hit_ids])]
+
+        # Costruisci le etichette dei match solo per i top-k sopravvissuti
+        # (vedi _score_field per lo scoring del singolo campo)
+        top_set = set(order.tolist())
+        matches = {idx: [] for idx in top_set}
+        for label, hits, raw, owner in field_hits:
+            for j in hits:
+                item_id = owner[j]
+                if item_id in top_set:
+                    text = raw[j]
+                    if label == 'description':
+                        matches[item_id].append(f"description: {text[:100]}...")
+                    else:
+                        matches[item_id].append(f"{label}: {text}")
+
         results = []
-        query_lower = query.lower()
-        
-        for item in self.indexed_data:
-            score = 0
-            matches = []
-            
-            # Cerca nelle keywords
-            for keyword in item.get('keywords', []):
-                similarity = fuzz.ratio(query_lower, keyword.lower())
-                if similarity > threshold:
-                    score += similarity * 2  # Peso maggiore per keywords
-                    matches.append(f"keyword: {keyword}")
-            
-            # Cerca nella descrizione
-            description = item.get('description', '')
-            if description:
-                similarity = fuzz.partial_ratio(query_lower, description.lower())
-                if similarity > threshold:
-                    score += similarity
-                    matches.append(f"description: {description[:100]}...")
-            
-            # Cerca nel titolo
-            title = item.get('title', '')
-            if title:
-                similarity = fuzz.partial_ratio(query_lower, title.lower())
-                if similarity > threshold:
-                    score += similarity * 1.5  # Peso intermedio per titolo
-                    matches.append(f"title: {title}")
-            
-            # Cerca nei main_topics
-            for topic in item.get('main_topics', []):
-                similarity = fuzz.ratio(query_lower, topic.lower())
-                if similarity > threshold:
-                    score += similarity * 1.2
-                    matches.append(f"topic: {topic}")
-            
-            if score > 0:
-                item_copy = item.copy()
-                item_copy['search_score'] = score
-                item_copy['matches'] = matches
-                results.append(item_copy)
-        
-        # Ordina per punteggio
-        results.sort(key=lambda x: x['search_score'], reverse=True)
+        for idx in order:
+            item_copy = self.indexed_data[idx].copy()
+            item_copy['search_score'] = float(scores[idx])
+            item_copy['matches'] = matches[idx]
+            results.append(item_copy)
         return results
     
+    def _score_field(self, query_lower: str, threshold: int, field,
+                     candidate_ids: np.ndarray, n_items: int):
+        """
+        Valuta un singolo campo contro la query; pensato per girare su un
+        thread del pool (rapidfuzz rilascia il GIL durante cdist)
+        """
+        corpus, raw, owner, scorer, weight, label = field
+        if not corpus:
+            return None
+        # Restringi il corpus del campo ai soli candidati
+        if candidate_ids.size < n_items:
+            keep = np.nonzero(np.isin(owner, candidate_ids))[0]
+        else:
+            keep = np.arange(len(corpus), dtype=np.intp)
+        # Prefiltro per le descrizioni: il fuzzy su testi lunghi e' la parte
+        # piu' costosa, quindi saltiamo le descrizioni che non condividono
+        # nemmeno un trigramma di caratteri con la query
+        if label == 'description':
+            query_tris = _text_trigrams(query_lower)
+            if query_tris:
+                tri_sets = self._desc_trigram_sets
+                keep = np.fromiter(
+                    (j for j in keep if query_tris & tri_sets[j]),
+                    dtype=np.intp
+                )
+        if keep.size == 0:
+            return None
+        if keep.size < len(corpus):
+            sub_corpus = [corpus[j] for j in keep]
+        else:
+            keep = None
+            sub_corpus = corpus
+        # cdist calcola tutta la riga in C++ (workers=-1 usa tutti i core);
+        # score_cutoff azzera i punteggi sotto soglia senza branch Python.
+        # processor=None: i corpus sono gia' normalizzati al caricamento.
+        # Invariante: la query sta nel primo argomento (lato "queries") e il
+        # corpus nel secondo, cosi' rapidfuzz precalcola i bit vector di
+        # Levenshtein della query una volta sola e ogni confronto paga solo
+        # il costo lato corpus — non invertire gli argomenti
+        row = process.cdist(
+            [query_lower], sub_corpus,
+            scorer=scorer, processor=None,
+            score_cutoff=threshold, workers=-1
+        )[0]
+        hits = np.nonzero(row)[0]
+        if hits.size == 0:
+            return None
+        row_hits = row[hits]
+        if keep is not None:
+            hits = keep[hits]
+        return label, hits, row_hits, raw, owner, weight
+
     def filter_by_criteria(self, criteria: Dict) -> List[Dict]:
         """
         Filtra i dati per criteri specifici
@@ -148,51 +493,44 @@ class SearchBot:
         Returns:
             Dizionario con statistiche
         """
+        if self._stats_cache is not None:
+            return self._stats_cache
+
         if not self.indexed_data:
             return {}
-        
-        stats = {
-            'total_pages': len(self.indexed_data),
-            'content_types': defaultdict(int),
-            'languages': defaultdict(int),
-            'quality_distribution': defaultdict(int),
-            'sentiment_distribution': defaultdict(int),
-            'target_audiences': defaultdict(int),
-            'avg_relevance_score': 0,
-            'top_keywords': defaultdict(int),
-            'top_topics': defaultdict(int)
+
+        data = self.indexed_data
+        n_items = len(data)
+
+        # Counter consuma gli iterabili in C; chain.from_iterable evita
+        # i loop Python annidati su keywords/topics
+        content_types = Counter(item.get('content_type', 'unknown') for item in data)
+        languages = Counter(item.get('language', 'unknown') for item in data)
+        quality_distribution = Counter(item.get('content_quality', 'unknown') for item in data)
+        sentiment_distribution = Counter(item.get('sentiment', 'unknown') for item in data)
+        target_audiences = Counter(item.get('target_audience', 'unknown') for item in data)
+
+        top_keywords = Counter()
+        top_keywords.update(
+            kw.lower() for kw in chain.from_iterable(item.get('keywords', ()) for item in data))
+        top_topics = Counter()
+        top_topics.update(
+            topic.lower() for topic in chain.from_iterable(item.get('main_topics', ()) for item in data))
+
+        total_relevance = sum(item.get('relevance_score', 0) for item in data)
+
+        self._stats_cache = {
+            'total_pages': n_items,
+            'content_types': dict(content_types),
+            'languages': dict(languages),
+            'quality_distribution': dict(quality_distribution),
+            'sentiment_distribution': dict(sentiment_distribution),
+            'target_audiences': dict(target_audiences),
+            'avg_relevance_score': total_relevance / n_items,
+            'top_keywords': dict(top_keywords.most_common(10)),
+            'top_topics': dict(top_topics.most_common(10))
         }
-        
-        total_relevance = 0
-        
-        for item in self.indexed_data:
-            stats['content_types'][item.get('content_type', 'unknown')] += 1
-            stats['languages'][item.get('language', 'unknown')] += 1
-            stats['quality_distribution'][item.get('content_quality', 'unknown')] += 1
-            stats['sentiment_distribution'][item.get('sentiment', 'unknown')] += 1
-            stats['target_audiences'][item.get('target_audience', 'unknown')] += 1
-            
-            total_relevance += item.get('relevance_score', 0)
-            
-            # Conta keywords e topics
-            for keyword in item.get('keywords', []):
-                stats['top_keywords'][keyword.lower()] += 1
-            
-            for topic in item.get('main_topics', []):
-                stats['top_topics'][topic.lower()] += 1
-        
-        stats['avg_relevance_score'] = total_relevance / len(self.indexed_data)
-        
-        # Converti in dict normali e prendi i top 10
-        stats['content_types'] = dict(stats['content_types'])
-        stats['languages'] = dict(stats['languages'])
-        stats['quality_distribution'] = dict(stats['quality_distribution'])
-        stats['sentiment_distribution'] = dict(stats['sentiment_distribution'])
-        stats['target_audiences'] = dict(stats['target_audiences'])
-        stats['top_keywords'] = dict(sorted(stats['top_keywords'].items(), key=lambda x: x[1], reverse=True)[:10])
-        stats['top_topics'] = dict(sorted(stats['top_topics'].items(), key=lambda x: x[1], reverse=True)[:10])
-        
-        return stats
+        return self._stats_cache
     
     def analyze_query_with_ai(self, user_query: str, search_results: List[Dict]) -> str:
         """
@@ -206,35 +544,34 @@ class SearchBot:
             Risposta dettagliata generata dall'AI
         """
         try:
-            # Prepara i dati per l'AI
+            # Prepara i dati per l'AI: descrizioni troncate, niente matches
+            # (ridondanti con le keywords) e keywords solo per i primi 5,
+            # per tenere basso il numero di token del prompt
             results_summary = []
             for i, result in enumerate(search_results[:10]):  # Limita a 10 risultati
-                summary = {
-                    'url': result['url'],
-                    'title': result['title'],
-                    'description': result['description'],
-                    'keywords': result['keywords'],
-                    'content_type': result['content_type'],
-                    'main_topics': result['main_topics'],
-                    'relevance_score': result['relevance_score'],
-                    'matches': result.get('matches', [])
-                }
+                summary = {k: result.get(k) for k in _PROMPT_KEYS}
+                summary['description'] = (result.get('description') or '')[:200]
+                summary['relevance_score'] = result.get('relevance_score', 0)
+                if i < 5:
+                    summary['keywords'] = result['keywords']
                 results_summary.append(summary)
-            
-            # Statistiche generali
+
+            # Statistiche ridotte a una riga: il blob completo non aggiunge
+            # informazione utile al modello e domina il conteggio token
             stats = self.get_statistics_summary()
-            
-            # Prompt per l'AI
+            top_kw = ', '.join(list(stats.get('top_keywords', {}))[:3])
+            stats_line = f"{stats.get('total_pages', 0)} pagine indicizzate; keyword principali: {top_kw}"
+
+            # Prompt per l'AI (serializzazione compatta, senza indent)
             prompt = f"""
 Sei un assistente esperto che aiuta gli utenti a trovare informazioni in un database di pagine web indicizzate.
 
 DOMANDA DELL'UTENTE: {user_query}
 
 RISULTATI DELLA RICERCA ({len(search_results)} risultati totali):
-{json.dumps(results_summary, indent=2, ensure_ascii=False)}
+{orjson.dumps(results_summary).decode()}
 
-STATISTICHE GENERALI DEL DATABASE:
-{json.dumps(stats, indent=2, ensure_ascii=False)}
+DATABASE: {stats_line}
 
 ISTRUZIONI:
 1. Analizza la domanda dell'utente e i risultati della ricerca
@@ -285,20 +622,34 @@ FORMATO DELLA RISPOSTA:
             Dizionario con risultati e risposta AI
         """
         logger.info(f"Processando query: {user_query}")
-        
-        # Cerca nei dati
-        search_results = self.search_by_keywords(user_query)[:max_results]
-        
+
+        # Cache con TTL: query identiche ripetute evitano sia lo scoring
+        # fuzzy che la chiamata Groq
+        cache_key = (user_query.lower().strip(), max_results)
+        now = time.monotonic()
+        entry = self._answer_cache.get(cache_key)
+        if entry is not None and entry[0] > now:
+            self._answer_cache.move_to_end(cache_key)
+            return dict(entry[1])
+
+        # Cerca nei dati (top-k selezionato direttamente nello scoring)
+        search_results = self.search_by_keywords(user_query, max_results=max_results)
+
         # Genera risposta AI
         ai_response = self.analyze_query_with_ai(user_query, search_results)
-        
-        return {
+
+        response = {
             'query': user_query,
             'results_count': len(search_results),
             'search_results': search_results,
             'ai_response': ai_response,
             'timestamp': datetime.now().isoformat()
         }
+
+        self._answer_cache[cache_key] = (now + _ANSWER_CACHE_TTL, response)
+        if len(self._answer_cache) > _ANSWER_CACHE_SIZE:
+            self._answer_cache.popitem(last=False)
+        return response
     
     def save_response_to_file(self, response_data: Dict, output_format: str = 'txt') -> str:
         """
@@ -312,7 +663,7 @@ FORMATO DELLA RISPOSTA:
             Percorso del file creato
         """
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        query_clean = re.sub(r'[^\w\s-]', '', response_data['query'])[:50]
+        query_clean = _FILENAME_RE.sub('', response_data['query'])[:50]
         filename = f"risposta_{query_clean}_{timestamp}.{output_format}"
         
         try:
@@ -336,17 +687,21 @@ FORMATO DELLA RISPOSTA:
                         f.write(f"   Punteggio: {result.get('search_score', 0)}\n\n")
             
             elif output_format == 'doc':
-                # Per un file .doc semplice (RTF)
-                with open(filename.replace('.doc', '.rtf'), 'w', encoding='utf-8') as f:
-                    f.write(r'{\rtf1\ansi\deff0 {\fonttbl {\f0 Times New Roman;}}')
-                    f.write(r'\f0\fs24 ')
-                    f.write(f"DOMANDA: {response_data['query']}\\par ")
-                    f.write(f"DATA: {response_data['timestamp']}\\par ")
-                    f.write(f"RISULTATI TROVATI: {response_data['results_count']}\\par\\par ")
-                    f.write("RISPOSTA:\\par ")
-                    f.write(response_data['ai_response'].replace('\n', '\\par '))
-                    f.write('}')
+                # Per un file .doc semplice (RTF): assembla le parti in una
+                # lista e fai una sola write invece di tante piccole
                 filename = filename.replace('.doc', '.rtf')
+                parts = [
+                    r'{\rtf1\ansi\deff0 {\fonttbl {\f0 Times New Roman;}}',
+                    r'\f0\fs24 ',
+                    f"DOMANDA: {response_data['query']}\\par ",
+                    f"DATA: {response_data['timestamp']}\\par ",
+                    f"RISULTATI TROVATI: {response_data['results_count']}\\par\\par ",
+                    "RISPOSTA:\\par ",
+                    response_data['ai_response'].translate(_RTF_TRANSLATE),
+                    '}',
+                ]
+                with open(filename, 'w', encoding='utf-8') as f:
+                    f.write(''.join(parts))
             
             logger.info(f"Risposta salvata in: {filename}")
             return filename
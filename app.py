@@ -1,20 +1,125 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 import json
+import mmap
+import orjson
 import re
+import time
+
+# yajl2_c is the fastest ijson backend; fall back to the default one
+try:
+    import ijson.backends.yajl2_c as ijson
+except ImportError:
+    import ijson
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from groq import Groq
 import logging
-from fuzzywuzzy import fuzz
-from collections import defaultdict
+import numpy as np
+from numba import njit, prange
+from rapidfuzz import fuzz, process
+from collections import defaultdict, Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 import os
 import io
 
+# Sizes/TTL of the in-process search caches
+_SEARCH_CACHE_SIZE = 512
+_ANSWER_CACHE_SIZE = 128
+_ANSWER_CACHE_TTL = 300.0  # seconds
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+
+# Only fields read by search, statistics and prompts: everything else
+# (markdown, internal links, debug payloads) never gets materialized
+_ITEM_KEYS = ('url', 'title', 'description', 'keywords', 'main_topics',
+              'content_type', 'language', 'relevance_score',
+              'content_quality', 'sentiment', 'target_audience')
+
+
+def _project(obj):
+    """Project an index item onto the fields the application actually uses"""
+    return {k: obj[k] for k in _ITEM_KEYS if k in obj}
+
+
+# Result fields forwarded verbatim into the AI prompt
+_PROMPT_KEYS = ('url', 'title', 'content_type', 'main_topics')
+
+
+def _text_trigrams(text):
+    """Return the set of character trigrams of a text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# Bloom bitset of character bigrams: 4 64-bit words = 256 buckets
+_BITSET_WORDS = 4
+
+
+def _fill_bigram_bits(bits, text):
+    """Set the buckets of the text's character bigrams in the bitset"""
+    for i in range(len(text) - 1):
+        h = hash(text[i:i + 2]) & 255
+        bits[h >> 6] |= np.uint64(1) << np.uint64(h & 63)
+
+
+@njit(parallel=True, cache=True)
+def _bigram_overlap_counts(bitsets, query_bits):
+    """
+    Count, for each item, how many bigram buckets it shares with the
+    query (AND + popcount over the bitsets), parallelized with prange
+    """
+    n = bitsets.shape[0]
+    out = np.zeros(n, dtype=np.int64)
+    for i in prange(n):
+        count = 0
+        for w in range(bitsets.shape[1]):
+            v = bitsets[i, w] & query_bits[w]
+            while v:
+                v &= v - np.uint64(1)
+                count += 1
+        out[i] = count
+    return out
+
+
+class _LazyJsonLines:
+    """
+    Read-only sequence over a memory-mapped JSON Lines file: keeps only
+    the line-offset table in RAM (8 bytes per item) and decodes each
+    item on demand with orjson
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._size = len(self._mm)
+        offsets = [0]
+        pos = self._mm.find(b'\n')
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = self._mm.find(b'\n', pos + 1)
+        # Drop the offset past the end (newline-terminated file)
+        if offsets[-1] >= self._size:
+            offsets.pop()
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, i):
+        start = self._offsets[i]
+        if i + 1 < len(self._offsets):
+            end = self._offsets[i + 1] - 1
+        else:
+            end = self._size
+        return _project(orjson.loads(self._mm[start:end]))
+
+    def __iter__(self):
+        for i in range(len(self._offsets)):
+            yield self[i]
+
 
 class SearchBot:
     def __init__(self, groq_api_key: str, json_file_path: str):
@@ -28,130 +133,333 @@ class SearchBot:
         self.groq_client = Groq(api_key=groq_api_key)
         self.json_file_path = json_file_path
         self.indexed_data = []
+        # Pool for concurrent field scoring: rapidfuzz releases the GIL
+        # during computation, so threads actually scale
+        self._pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4,
+                                        thread_name_prefix='score')
         self.load_json_data()
     
     def load_json_data(self):
         """Load data from JSON file"""
+        # Caches are (re)initialized on every load: stored results refer
+        # to the contents of the current index
+        self._search_cache = OrderedDict()
+        self._answer_cache = OrderedDict()
+        # Statistics are immutable between reloads: computed at most once
+        self._stats_cache = None
         try:
-            with open(self.json_file_path, 'r', encoding='utf-8') as f:
-                self.indexed_data = json.load(f)
-            logger.info(f"Loaded {len(self.indexed_data)} items from JSON file")
+            # If a JSON Lines version of the index exists, memory-map it and
+            # decode items on demand (see ai_searcher.convert_index_to_jsonl)
+            jsonl_path = self.json_file_path.rsplit('.json', 1)[0] + '.jsonl'
+            if os.path.exists(jsonl_path) and os.path.getsize(jsonl_path) > 0:
+                self.indexed_data = _LazyJsonLines(jsonl_path)
+                logger.info(f"Mapped JSONL index: {len(self.indexed_data)} items (lazy)")
+            else:
+                # Streaming parse: one item at a time, projected onto the used
+                # fields, without ever building the whole document in memory
+                with open(self.json_file_path, 'rb') as f:
+                    # use_float: without it ijson yields decimal.Decimal
+                    # for JSON floats, which orjson and the SSE json
+                    # serializer both refuse to encode
+                    self.indexed_data = [_project(obj) for obj in ijson.items(f, 'item', use_float=True)]
+                logger.info(f"Loaded {len(self.indexed_data)} items from JSON file")
         except Exception as e:
             logger.error(f"Error loading JSON file: {str(e)}")
             self.indexed_data = []
-    
-    def search_by_keywords(self, query: str, threshold: int = 70) -> List[Dict]:
-        """Search data using keywords"""
-        results = []
-        query_lower = query.lower()
-        
-        for item in self.indexed_data:
-            score = 0
-            matches = []
-            
-            # Search in keywords
+        self._build_search_arrays()
+
+    def _build_search_arrays(self):
+        """
+        Build flat corpora (plus owner-item indices) for vectorized scoring
+        via rapidfuzz.process.cdist. Corpora are lowercased once here so
+        scoring can run with processor=None and skip re-normalization
+        """
+        kw_corpus, kw_raw, kw_owner = [], [], []
+        desc_corpus, desc_raw, desc_owner = [], [], []
+        title_corpus, title_raw, title_owner = [], [], []
+        topic_corpus, topic_raw, topic_owner = [], [], []
+
+        # Per-description trigram sets: a prefilter that skips fuzzy
+        # scoring on long descriptions sharing no trigram with the query
+        desc_trigram_sets = []
+
+        # Inverted index: token -> item ids (exact matches) and
+        # trigram -> item ids (candidate generation for fuzzy scoring)
+        kw_postings = defaultdict(list)
+        trigram_index = defaultdict(set)
+
+        # Per-item bigram bloom bitsets, used as a JIT'd prefilter
+        bigram_bitsets = np.zeros((len(self.indexed_data), _BITSET_WORDS), dtype=np.uint64)
+
+        for idx, item in enumerate(self.indexed_data):
             for keyword in item.get('keywords', []):
-                similarity = fuzz.ratio(query_lower, keyword.lower())
-                if similarity > threshold:
-                    score += similarity * 2
-                    matches.append(f"keyword: {keyword}")
-            
-            # Search in description
+                kw_lc = keyword.lower()
+                kw_corpus.append(kw_lc)
+                kw_raw.append(keyword)
+                kw_owner.append(idx)
+                for token in kw_lc.split():
+                    kw_postings[token].append(idx)
+                for trigram in _text_trigrams(kw_lc):
+                    trigram_index[trigram].add(idx)
+                _fill_bigram_bits(bigram_bitsets[idx], kw_lc)
             description = item.get('description', '')
             if description:
-                similarity = fuzz.partial_ratio(query_lower, description.lower())
-                if similarity > threshold:
-                    score += similarity
-                    matches.append(f"description: {description[:100]}...")
-            
-            # Search in title
+                desc_lc = description.lower()
+                desc_corpus.append(desc_lc)
+                desc_raw.append(description)
+                desc_owner.append(idx)
+                desc_trigram_sets.append(frozenset(_text_trigrams(desc_lc)))
+                for trigram in _text_trigrams(desc_lc):
+                    trigram_index[trigram].add(idx)
+                _fill_bigram_bits(bigram_bitsets[idx], desc_lc)
             title = item.get('title', '')
             if title:
-                similarity = fuzz.partial_ratio(query_lower, title.lower())
-                if similarity > threshold:
-                    score += similarity * 1.5
-                    matches.append(f"title: {title}")
-            
-            # Search in main_topics
+                title_lc = title.lower()
+                title_corpus.append(title_lc)
+                title_raw.append(title)
+                title_owner.append(idx)
+                for trigram in _text_trigrams(title_lc):
+                    trigram_index[trigram].add(idx)
+                _fill_bigram_bits(bigram_bitsets[idx], title_lc)
             for topic in item.get('main_topics', []):
-                similarity = fuzz.ratio(query_lower, topic.lower())
-                if similarity > threshold:
-                    score += similarity * 1.2
-                    matches.append(f"topic: {topic}")
-            
-            if score > 0:
-                item_copy = item.copy()
-                item_copy['search_score'] = score
-                item_copy['matches'] = matches
-                results.append(item_copy)
-        
-        # Sort by score
-        results.sort(key=lambda x: x['search_score'], reverse=True)
+                topic_lc = topic.lower()
+                topic_corpus.append(topic_lc)
+                topic_raw.append(topic)
+                topic_owner.append(idx)
+                for trigram in _text_trigrams(topic_lc):
+                    trigram_index[trigram].add(idx)
+                _fill_bigram_bits(bigram_bitsets[idx], topic_lc)
+
+        self._kw_postings = dict(kw_postings)
+        self._trigrams = dict(trigram_index)
+        self._bigram_bitsets = bigram_bitsets
+        self._desc_trigram_sets = desc_trigram_sets
+
+        # (normalized corpus, original text, owner, scorer, weight, match label).
+        # token_set_ratio is the most robust scorer on noisy text, and with a
+        # tight score_cutoff rapidfuzz aborts DP rows as soon as the bound
+        # drops below the threshold
+        self._search_fields = (
+            (kw_corpus, kw_raw, np.asarray(kw_owner, dtype=np.intp), fuzz.token_set_ratio, 2.0, 'keyword'),
+            (desc_corpus, desc_raw, np.asarray(desc_owner, dtype=np.intp), fuzz.token_set_ratio, 1.0, 'description'),
+            (title_corpus, title_raw, np.asarray(title_owner, dtype=np.intp), fuzz.token_set_ratio, 1.5, 'title'),
+            (topic_corpus, topic_raw, np.asarray(topic_owner, dtype=np.intp), fuzz.token_set_ratio, 1.2, 'topic'),
+        )
+
+    def search_by_keywords(self, query: str, threshold: int = 70,
+                           max_results: Optional[int] = None) -> List[Dict]:
+        """Search data using keywords, optionally keeping only the top-k results"""
+        query_lower = query.lower().strip()
+        cache_key = (query_lower, threshold, max_results)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            self._search_cache.move_to_end(cache_key)
+            return list(cached)
+
+        results = self._score_query(query_lower, threshold, max_results)
+
+        self._search_cache[cache_key] = results
+        if len(self._search_cache) > _SEARCH_CACHE_SIZE:
+            self._search_cache.popitem(last=False)
+        return list(results)
+
+    def _score_query(self, query_lower: str, threshold: int,
+                     max_results: Optional[int] = None) -> List[Dict]:
+        """Run the actual fuzzy scoring (uncached)"""
+        n_items = len(self.indexed_data)
+        if n_items == 0:
+            return []
+
+        if len(query_lower) >= 3:
+            # Candidate pruning: only items sharing a token (posting list) or
+            # at least one trigram with the query go through fuzzy scoring;
+            # anything else cannot clear the threshold anyway
+            candidates = set()
+            for token in query_lower.split():
+                candidates.update(self._kw_postings.get(token, ()))
+            for trigram in _text_trigrams(query_lower):
+                candidates.update(self._trigrams.get(trigram, ()))
+            if not candidates:
+                return []
+            candidate_ids = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+
+            # JIT prefilter: drop candidates that don't even share one bigram
+            # bucket with the query (parallel AND+popcount)
+            query_bits = np.zeros(_BITSET_WORDS, dtype=np.uint64)
+            _fill_bigram_bits(query_bits, query_lower)
+            overlap = _bigram_overlap_counts(self._bigram_bitsets, query_bits)
+            candidate_ids = candidate_ids[overlap[candidate_ids] > 0]
+            if candidate_ids.size == 0:
+                return []
+        else:
+            # Queries shorter than a trigram produce no n-grams to generate
+            # candidates from, so the prefilters would wrongly drop
+            # legitimate matches (e.g. "ai"). Score the full corpus
+            # instead, as the baseline fuzzy scoring did
+            candidate_ids = np.arange(n_items, dtype=np.intp)
+
+        # Accumulate per-item scores in an array instead of copied dicts;
+        # textual matches are only recorded here and materialized after
+        # top-k selection, so discarded items never pay for the strings.
+        # The four fields are scored in parallel on the thread pool
+        scores = np.zeros(n_items, dtype=np.float64)
+        field_hits = []
+
+        futures = [
+            self._pool.submit(self._score_field, query_lower, threshold,
+                              field, candidate_ids, n_items)
+            for field in self._search_fields
+        ]
+        for future in futures:
+            scored = future.result()
+            if scored is None:
+                continue
+            label, hits, row_hits, raw, owner, weight = scored
+            np.add.at(scores, owner[hits], row_hits * weight)
+            field_hits.append((label, hits, raw, owner))
+
+        # Materialize copies only for items that actually scored; for
+        # k << R the argpartition top-k selection avoids the full sort
+        hit_ids = np.nonzero(scores)[0]
+        if max_results is not None and max_results < hit_ids.size:
+            top = hit_ids[np.argpartition(-scores[hit_ids], max_results - 1)[:max_results]]
+            order = top[np.argsort(-scores[top])]
+        else:
+            order = hit_ids[np.argsort(-scores[hit_ids])]
+
+        # Build match labels only for the surviving top-k items
+        top_set = set(order.tolist())
+        matches = {idx: [] for idx in top_set}
+        for label, hits, raw, owner in field_hits:
+            for j in hits:
+                item_id = owner[j]
+                if item_id in top_set:
+                    text = raw[j]
+                    if label == 'description':
+                        matches[item_id].append(f"description: {text[:100]}...")
+                    else:
+                        matches[item_id].append(f"{label}: {text}")
+
+        results = []
+        for idx in order:
+            item_copy = self.indexed_data[idx].copy()
+            item_copy['search_score'] = float(scores[idx])
+            item_copy['matches'] = matches[idx]
+            results.append(item_copy)
         return results
     
     def get_statistics_summary(self) -> Dict:
         """Generate statistical summary of data"""
+        if self._stats_cache is not None:
+            return self._stats_cache
+
         if not self.indexed_data:
             return {}
-        
-        stats = {
-            'total_pages': len(self.indexed_data),
-            'content_types': defaultdict(int),
-            'languages': defaultdict(int),
-            'top_keywords': defaultdict(int),
-            'top_topics': defaultdict(int)
+
+        data = self.indexed_data
+
+        # Counter consumes iterables in C; chain.from_iterable avoids the
+        # nested Python loops over keywords/topics
+        content_types = Counter(item.get('content_type', 'unknown') for item in data)
+        languages = Counter(item.get('language', 'unknown') for item in data)
+
+        top_keywords = Counter()
+        top_keywords.update(
+            kw.lower() for kw in chain.from_iterable(item.get('keywords', ()) for item in data))
+        top_topics = Counter()
+        top_topics.update(
+            topic.lower() for topic in chain.from_iterable(item.get('main_topics', ()) for item in data))
+
+        self._stats_cache = {
+            'total_pages': len(data),
+            'content_types': dict(content_types),
+            'languages': dict(languages),
+            'top_keywords': dict(top_keywords.most_common(10)),
+            'top_topics': dict(top_topics.most_common(10))
         }
-        
-        for item in self.indexed_data:
-            stats['content_types'][item.get('content_type', 'unknown')] += 1
-            stats['languages'][item.get('language', 'unknown')] += 1
-            
-            for keyword in item.get('keywords', []):
-                stats['top_keywords'][keyword.lower()] += 1
-            
-            for topic in item.get('main_topics', []):
-                stats['top_topics'][topic.lower()] += 1
-        
-        # Convert to normal dicts and get top 10
-        stats['content_types'] = dict(stats['content_types'])
-        stats['languages'] = dict(stats['languages'])
-        stats['top_keywords'] = dict(sorted(stats['top_keywords'].items(), key=lambda x: x[1], reverse=True)[:10])
-        stats['top_topics'] = dict(sorted(stats['top_topics'].items(), key=lambda x: x[1], reverse=True)[:10])
-        
-        return stats
+        return self._stats_cache
     
-    def analyze_query_with_ai(self, user_query: str, search_results: List[Dict]) -> str:
-        """Analyze user query and results with AI"""
-        try:
-            # Prepare data for AI
-            results_summary = []
-            for i, result in enumerate(search_results[:10]):
-                summary = {
-                    'url': result['url'],
-                    'title': result['title'],
-                    'description': result['description'],
-                    'keywords': result['keywords'],
-                    'content_type': result['content_type'],
-                    'main_topics': result['main_topics'],
-                    'relevance_score': result.get('relevance_score', 0),
-                    'matches': result.get('matches', [])
-                }
-                results_summary.append(summary)
-            
-            # General statistics
-            stats = self.get_statistics_summary()
-            
-            # AI prompt
-            prompt = f"""
+    def _score_field(self, query_lower: str, threshold: int, field,
+                     candidate_ids: np.ndarray, n_items: int):
+        """
+        Score a single field against the query; designed to run on a pool
+        thread (rapidfuzz releases the GIL during cdist)
+        """
+        corpus, raw, owner, scorer, weight, label = field
+        if not corpus:
+            return None
+        # Restrict this field's corpus to the candidate subset
+        if candidate_ids.size < n_items:
+            keep = np.nonzero(np.isin(owner, candidate_ids))[0]
+        else:
+            keep = np.arange(len(corpus), dtype=np.intp)
+        # Description prefilter: fuzzy matching long texts is the costly
+        # part, so skip descriptions that share no character trigram at
+        # all with the query
+        if label == 'description':
+            query_tris = _text_trigrams(query_lower)
+            if query_tris:
+                tri_sets = self._desc_trigram_sets
+                keep = np.fromiter(
+                    (j for j in keep if query_tris & tri_sets[j]),
+                    dtype=np.intp
+                )
+        if keep.size == 0:
+            return None
+        if keep.size < len(corpus):
+            sub_corpus = [corpus[j] for j in keep]
+        else:
+            keep = None
+            sub_corpus = corpus
+        # cdist computes the whole row in C++ (workers=-1 uses all cores);
+        # score_cutoff zeroes sub-threshold scores without Python branches.
+        # processor=None: corpora were already normalized at load time.
+        # Invariant: the query goes in the first argument (the "queries"
+        # side) and the corpus in the second, so rapidfuzz precomputes the
+        # query's Levenshtein bit vectors once and each comparison only
+        # pays the corpus-side cost — do not swap the arguments
+        row = process.cdist(
+            [query_lower], sub_corpus,
+            scorer=scorer, processor=None,
+            score_cutoff=threshold, workers=-1
+        )[0]
+        hits = np.nonzero(row)[0]
+        if hits.size == 0:
+            return None
+        row_hits = row[hits]
+        if keep is not None:
+            hits = keep[hits]
+        return label, hits, row_hits, raw, owner, weight
+
+    def _build_analysis_prompt(self, user_query: str, search_results: List[Dict]) -> str:
+        """Build the analysis prompt shared by blocking and streaming AI calls"""
+        # Prepare data for AI: truncated descriptions, no matches (redundant
+        # with keywords) and keywords only for the top 5, to keep the
+        # prompt token count low
+        results_summary = []
+        for i, result in enumerate(search_results[:10]):
+            summary = {k: result.get(k) for k in _PROMPT_KEYS}
+            summary['description'] = (result.get('description') or '')[:200]
+            summary['relevance_score'] = result.get('relevance_score', 0)
+            if i < 5:
+                summary['keywords'] = result['keywords']
+            results_summary.append(summary)
+
+        # Statistics reduced to one line: the full blob adds no useful
+        # signal for the model and dominates the token count
+        stats = self.get_statistics_summary()
+        top_kw = ', '.join(list(stats.get('top_keywords', {}))[:3])
+        stats_line = f"{stats.get('total_pages', 0)} indexed pages; top keywords: {top_kw}"
+
+        return f"""
 You are an expert assistant helping users find information in an indexed web pages database.
 
 USER QUESTION: {user_query}
 
 SEARCH RESULTS ({len(search_results)} total results):
-{json.dumps(results_summary, indent=2, ensure_ascii=False)}
+{orjson.dumps(results_summary).decode()}
 
-GENERAL DATABASE STATISTICS:
-{json.dumps(stats, indent=2, ensure_ascii=False)}
+DATABASE: {stats_line}
 
 INSTRUCTIONS:
 1. Analyze the user's question and search results
@@ -173,6 +481,11 @@ RESPONSE FORMAT:
 - Write in Italian
 """
 
+    def analyze_query_with_ai(self, user_query: str, search_results: List[Dict]) -> str:
+        """Analyze user query and results with AI"""
+        try:
+            prompt = self._build_analysis_prompt(user_query, search_results)
+
             # AI call
             response = self.groq_client.chat.completions.create(
                 model="deepseek-r1-distill-llama-70b",
@@ -185,22 +498,54 @@ RESPONSE FORMAT:
             )
             
             return response.choices[0].message.content.strip()
-            
+
         except Exception as e:
             logger.error(f"Error in AI analysis: {str(e)}")
             return f"Error analyzing question: {str(e)}"
+
+    def stream_query_analysis(self, user_query: str, search_results: List[Dict]):
+        """
+        Yield the AI response incrementally (Groq stream=True), so callers
+        can forward tokens as soon as the model produces them
+        """
+        prompt = self._build_analysis_prompt(user_query, search_results)
+
+        response = self.groq_client.chat.completions.create(
+            model="deepseek-r1-distill-llama-70b",
+            messages=[
+                {"role": "system", "content": "You are an expert assistant for web information search. Always provide detailed, structured and helpful responses."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=2000,
+            stream=True
+        )
+
+        for chunk in response:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
     
     def search_and_answer(self, user_query: str, max_results: int = 20) -> Dict:
         """Search for information and generate complete response"""
         logger.info(f"Processing query: {user_query}")
-        
-        # Search in data
-        search_results = self.search_by_keywords(user_query)[:max_results]
-        
+
+        # TTL cache: repeated identical queries skip both fuzzy scoring
+        # and the Groq round trip
+        cache_key = (user_query.lower().strip(), max_results)
+        now = time.monotonic()
+        entry = self._answer_cache.get(cache_key)
+        if entry is not None and entry[0] > now:
+            self._answer_cache.move_to_end(cache_key)
+            return dict(entry[1])
+
+        # Search in data (top-k selected directly during scoring)
+        search_results = self.search_by_keywords(user_query, max_results=max_results)
+
         # Generate AI response
         ai_response = self.analyze_query_with_ai(user_query, search_results)
-        
-        return {
+
+        response = {
             'query': user_query,
             'results_count': len(search_results),
             'search_results': search_results,
@@ -208,72 +553,118 @@ RESPONSE FORMAT:
             'timestamp': datetime.now().isoformat()
         }
 
+        self._answer_cache[cache_key] = (now + _ANSWER_CACHE_TTL, response)
+        if len(self._answer_cache) > _ANSWER_CACHE_SIZE:
+            self._answer_cache.popitem(last=False)
+        return response
+
 # Configuration
 GROQ_API_KEY = "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"  # Replace with your API key
 JSON_FILE = "indexed_content.json"  # JSON file generated by previous bot
 
-# Initialize search bot
-search_bot = SearchBot(groq_api_key=GROQ_API_KEY, json_file_path=JSON_FILE)
 
-@app.route('/')
-def index():
-    """Main page"""
-    return render_template('index.html')
+def create_app():
+    """
+    Application factory. The SearchBot (index parse + precomputed search
+    tables) is built here, before workers fork: run with
+    `gunicorn --preload -w N 'app:app'` and the parsed data lives in
+    copy-on-write pages shared across all workers instead of being
+    re-parsed and duplicated N times
+    """
+    app = Flask(__name__)
 
-@app.route('/search', methods=['POST'])
-def search():
-    """Search endpoint"""
-    try:
-        data = request.get_json()
-        query = data.get('query', '').strip()
-        
-        if not query:
-            return jsonify({'error': 'No query provided'}), 400
-        
-        # Perform search
-        result = search_bot.search_and_answer(query)
-        
-        return jsonify(result)
-        
-    except Exception as e:
-        logger.error(f"Search error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/stats')
-def get_stats():
-    """Get database statistics"""
-    try:
-        stats = search_bot.get_statistics_summary()
-        return jsonify(stats)
-    except Exception as e:
-        logger.error(f"Stats error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/download/<format>')
-def download_results(format):
-    """Download search results"""
-    try:
-        # This would be called with the last search results
-        # For now, return a simple example
-        content = "Search results would be exported here"
-        
-        if format == 'txt':
-            output = io.StringIO()
-            output.write(content)
-            output.seek(0)
-            
-            return send_file(
-                io.BytesIO(output.getvalue().encode()),
-                mimetype='text/plain',
-                as_attachment=True,
-                download_name='search_results.txt'
-            )
-        
-        return jsonify({'error': 'Unsupported format'}), 400
-        
-    except Exception as e:
-        logger.error(f"Download error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+    # Initialize search bot once; all precomputed structures (corpora,
+    # inverted index, bigram bitsets) are ready before any fork
+    search_bot = SearchBot(groq_api_key=GROQ_API_KEY, json_file_path=JSON_FILE)
+
+    @app.route('/')
+    def index():
+        """Main page"""
+        return render_template('index.html')
+
+    @app.route('/search', methods=['POST'])
+    def search():
+        """Search endpoint"""
+        try:
+            data = request.get_json()
+            query = data.get('query', '').strip()
+
+            if not query:
+                return jsonify({'error': 'No query provided'}), 400
+
+            # Streaming mode: send results immediately, then forward AI tokens
+            # as Server-Sent Events so time-to-first-byte is the model's
+            # first-token latency instead of the full completion
+            if data.get('stream'):
+                search_results = search_bot.search_by_keywords(query, max_results=20)
+
+                def generate():
+                    meta = {
+                        'query': query,
+                        'results_count': len(search_results),
+                        'search_results': search_results,
+                        'timestamp': datetime.now().isoformat()
+                    }
+                    yield f"data: {json.dumps(meta, ensure_ascii=False)}\n\n"
+                    try:
+                        for delta in search_bot.stream_query_analysis(query, search_results):
+                            yield f"data: {json.dumps({'delta': delta}, ensure_ascii=False)}\n\n"
+                    except Exception as e:
+                        logger.error(f"Streaming error: {str(e)}")
+                        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                    yield "data: [DONE]\n\n"
+
+                return Response(stream_with_context(generate()), mimetype='text/event-stream')
+
+            # Non-streaming fallback (existing frontend and CLI behaviour)
+            result = search_bot.search_and_answer(query)
+
+            return jsonify(result)
+
+        except Exception as e:
+            logger.error(f"Search error: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/stats')
+    def get_stats():
+        """Get database statistics"""
+        try:
+            stats = search_bot.get_statistics_summary()
+            return jsonify(stats)
+        except Exception as e:
+            logger.error(f"Stats error: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/download/<format>')
+    def download_results(format):
+        """Download search results"""
+        try:
+            # This would be called with the last search results
+            # For now, return a simple example
+            content = "Search results would be exported here"
+
+            if format == 'txt':
+                output = io.StringIO()
+                output.write(content)
+                output.seek(0)
+
+                return send_file(
+                    io.BytesIO(output.getvalue().encode()),
+                    mimetype='text/plain',
+                    as_attachment=True,
+                    download_name='search_results.txt'
+                )
+
+            return jsonify({'error': 'Unsupported format'}), 400
+
+        except Exception as e:
+            logger.error(f"Download error: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    return app
+
+
+app = create_app()
 
 if __name__ == '__main__':
     # Create templates directory if it doesn't exist
@@ -1,108 +1,164 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import aiohttp
+import xxhash
+from aiolimiter import AsyncLimiter
+from lxml.etree import HTMLPullParser
+from pybloom_live import ScalableBloomFilter
 from urllib.parse import urljoin, urlparse
-import time
 import csv
-from collections import deque
 import logging
 
 class WebCrawler:
-    def __init__(self, base_url, max_pages=500, delay=1):
+    def __init__(self, base_url, max_pages=500, delay=1, concurrency=8):
         self.base_url = base_url
         self.domain = urlparse(base_url).netloc
         self.max_pages = max_pages
         self.delay = delay
-        
-        # Data structures to track progress
-        self.visited_urls = set()
-        self.all_links = set()
-        self.to_visit = deque([base_url])
+        self.concurrency = concurrency
+
+        # Data structures to track progress (no locks needed: all state
+        # is touched only from the single-threaded event loop).
+        # Membership is keyed by 64-bit xxhash: a set[int] costs ~28 B per
+        # entry versus 100+ B for full URL strings, and hashing long URLs
+        # with xxhash beats SipHash on the string itself. The strings are
+        # kept once, deduplicated, in _all_links_list for output
+        self._visited_hashes = set()
+        self._all_link_hashes = set()
+        self._all_links_list = []
         self.failed_urls = []
-        
+        self.pages_crawled = 0
+
+        # Seen-URL filter for the frontier: a scalable Bloom filter costs
+        # ~1.2 bytes per URL instead of ~100 B for the full string, so the
+        # "already enqueued?" check stays cheap at 100k+ URLs. visited_urls
+        # stays exact but only holds pages actually fetched
+        self.seen = ScalableBloomFilter(initial_capacity=100_000, error_rate=1e-4)
+        self.seen.add(base_url)
+
         # Setup logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
-        
-        # Session for connection pooling
-        self.session = requests.Session()
-        self.session.headers.update({
+
+        # Precomputed domain prefixes: is_valid_url runs on every href of
+        # every page, so a bytes-level startswith beats urlparse there
+        self._prefixes = ('http://' + self.domain + '/', 'https://' + self.domain + '/')
+        self._roots = ('http://' + self.domain, 'https://' + self.domain)
+
+        # Headers for the shared aiohttp session (connection pooling)
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        }
     
     def is_valid_url(self, url):
         """Check if URL belongs to the target domain"""
-        parsed = urlparse(url)
-        return parsed.netloc == self.domain
-    
+        return url.startswith(self._prefixes) or url in self._roots
+
     def normalize_url(self, url):
-        """Remove fragments and normalize URL"""
-        parsed = urlparse(url)
-        return f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+        """Remove query string and fragment, keeping scheme://netloc/path"""
+        return url.split('#', 1)[0].split('?', 1)[0]
     
-    def get_page_content(self, url):
+    async def get_page_content(self, session, url):
         """Fetch page content with error handling"""
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            return response.text
-        except requests.exceptions.RequestException as e:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                response.raise_for_status()
+                return await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             self.logger.error(f"Error fetching {url}: {e}")
             self.failed_urls.append(url)
             return None
     
     def extract_links(self, html_content, base_url):
         """Extract all links from HTML content"""
-        soup = BeautifulSoup(html_content, 'html.parser')
+        # Stream-parse only <a> start tags: the pull parser never
+        # materializes the full DOM, and clearing each element as soon as
+        # its href is read keeps peak memory at O(tree depth)
+        parser = HTMLPullParser(events=('start',), tag='a')
         links = set()
-        
-        # Find all anchor tags with href attributes
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            full_url = urljoin(base_url, href)
-            normalized_url = self.normalize_url(full_url)
-            
-            if self.is_valid_url(normalized_url):
-                links.add(normalized_url)
-        
+
+        parser.feed(html_content)
+        for _, element in parser.read_events():
+            href = element.get('href')
+            if href:
+                full_url = urljoin(base_url, href)
+                normalized_url = self.normalize_url(full_url)
+
+                if self.is_valid_url(normalized_url):
+                    links.add(normalized_url)
+            element.clear()
+        parser.close()
+
         return links
     
-    def crawl(self):
-        """Main crawling function"""
-        pages_crawled = 0
-        
+    async def _worker(self, session, queue, limiter):
+        """Worker task: pop URLs, fetch, parse, enqueue new links"""
+        while True:
+            current_url = await queue.get()
+            try:
+                url_hash = xxhash.xxh64_intdigest(current_url.encode())
+                if url_hash in self._visited_hashes or self.pages_crawled >= self.max_pages:
+                    continue
+
+                self.logger.info(f"Crawling ({self.pages_crawled + 1}/{self.max_pages}): {current_url}")
+
+                # Mark as visited before awaiting, so other workers
+                # don't pick up the same URL mid-fetch
+                self._visited_hashes.add(url_hash)
+
+                # Fetch page content. The shared limiter caps request
+                # starts at one per `delay` seconds across all workers,
+                # so concurrency changes overlap but never the rate
+                async with limiter:
+                    html_content = await self.get_page_content(session, current_url)
+                if not html_content:
+                    continue
+
+                self.pages_crawled += 1
+
+                # Extract links (dedup by hash, keep each string once)
+                page_links = self.extract_links(html_content, current_url)
+                for link in page_links:
+                    link_hash = xxhash.xxh64_intdigest(link.encode())
+                    if link_hash not in self._all_link_hashes:
+                        self._all_link_hashes.add(link_hash)
+                        self._all_links_list.append(link)
+
+                # Add new links to queue (Bloom filter keeps each URL
+                # from being enqueued more than once)
+                for link in page_links:
+                    if link not in self.seen:
+                        self.seen.add(link)
+                        queue.put_nowait(link)
+            finally:
+                queue.task_done()
+
+    async def crawl(self):
+        """Main crawling function: bounded concurrent fetches over a queue"""
         self.logger.info(f"Starting crawl of {self.base_url}")
-        
-        while self.to_visit and pages_crawled < self.max_pages:
-            current_url = self.to_visit.popleft()
-            
-            if current_url in self.visited_urls:
-                continue
-            
-            self.logger.info(f"Crawling ({pages_crawled + 1}/{self.max_pages}): {current_url}")
-            
-            # Fetch page content
-            html_content = self.get_page_content(current_url)
-            if not html_content:
-                continue
-            
-            # Mark as visited
-            self.visited_urls.add(current_url)
-            pages_crawled += 1
-            
-            # Extract links
-            page_links = self.extract_links(html_content, current_url)
-            self.all_links.update(page_links)
-            
-            # Add new links to queue
-            for link in page_links:
-                if link not in self.visited_urls:
-                    self.to_visit.append(link)
-            
-            # Be respectful - add delay between requests
-            time.sleep(self.delay)
-        
-        self.logger.info(f"Crawling completed. Visited {len(self.visited_urls)} pages")
-        self.logger.info(f"Found {len(self.all_links)} unique links")
+
+        queue = asyncio.Queue()
+        queue.put_nowait(self.base_url)
+
+        # Token bucket shared by all workers: aggregate politeness stays
+        # at 1/delay req/s regardless of how many workers are running
+        limiter = AsyncLimiter(1, self.delay)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(headers=self.headers, connector=connector) as session:
+            workers = [
+                asyncio.create_task(self._worker(session, queue, limiter))
+                for _ in range(self.concurrency)
+            ]
+            await queue.join()
+            for worker in workers:
+                worker.cancel()
+            # Workers exit via cancellation; an Exception here means a
+            # worker crashed and must not be silently discarded
+            for outcome in await asyncio.gather(*workers, return_exceptions=True):
+                if isinstance(outcome, Exception):
+                    self.logger.error(f"Worker crashed: {outcome!r}")
+
+        self.logger.info(f"Crawling completed. Visited {len(self._visited_hashes)} pages")
+        self.logger.info(f"Found {len(self._all_links_list)} unique links")
     
     def save_results(self, filename="unimi_links.csv"):
         """Save results to CSV file"""
@@ -110,8 +166,8 @@ class WebCrawler:
             writer = csv.writer(csvfile)
             writer.writerow(['URL', 'Status'])
             
-            for url in sorted(self.all_links):
-                status = 'Visited' if url in self.visited_urls else 'Discovered'
+            for url in sorted(self._all_links_list):
+                status = 'Visited' if xxhash.xxh64_intdigest(url.encode()) in self._visited_hashes else 'Discovered'
                 writer.writerow([url, status])
         
         self.logger.info(f"Results saved to {filename}")
@@ -120,8 +176,8 @@ class WebCrawler:
         """Print crawling summary"""
         print(f"\n=== CRAWLING SUMMARY ===")
         print(f"Base URL: {self.base_url}")
-        print(f"Pages visited: {len(self.visited_urls)}")
-        print(f"Total unique links found: {len(self.all_links)}")
+        print(f"Pages visited: {len(self._visited_hashes)}")
+        print(f"Total unique links found: {len(self._all_links_list)}")
         print(f"Failed URLs: {len(self.failed_urls)}")
         
         if self.failed_urls:
@@ -132,24 +188,24 @@ class WebCrawler:
                 print(f"  ... and {len(self.failed_urls) - 10} more")
         
         print(f"\nSample of discovered links:")
-        for i, url in enumerate(sorted(self.all_links)[:10]):
+        for i, url in enumerate(sorted(self._all_links_list)[:10]):
             print(f"  {i+1}. {url}")
-        if len(self.all_links) > 10:
-            print(f"  ... and {len(self.all_links) - 10} more")
+        if len(self._all_links_list) > 10:
+            print(f"  ... and {len(self._all_links_list) - 10} more")
 
-def main():
+async def main():
     # Configuration
     base_url = "https://www.unimi.it/it"
     max_pages = 10000  # Adjust based on your needs
-    delay = 1  # Delay between requests (seconds)
-    
+    delay = 1  # Aggregate delay between requests (seconds)
+
     # Create and run crawler
     crawler = WebCrawler(base_url, max_pages, delay)
-    crawler.crawl()
-    
+    await crawler.crawl()
+
     # Save results and print summary
     crawler.save_results()
     crawler.print_summary()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -1,44 +1,169 @@
 import asyncio
+import concurrent.futures
 import csv
 import json
-import re
+import orjson
 from datetime import datetime
 from typing import Dict, List, Optional, Set
-import aiohttp
-import pandas as pd
+import httpx
 from groq import Groq
 import logging
 from urllib.parse import urljoin, urlparse
-import time
-from bs4 import BeautifulSoup
-import requests
-from markdownify import markdownify as md
+import html2text
+import lxml.html
+import msgspec
+import xxhash
+from lxml.etree import XPath, strip_elements
 import os
 
 # Configurazione logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Headers per sembrare un browser normale (condivisi dalla sessione HTTP)
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'it-IT,it;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+# Prompt di sistema fisso per l'analisi: il template statico (schema e
+# istruzioni) viaggia una volta nel messaggio di sistema, il messaggio
+# utente porta solo il payload variabile
+_SYSTEM_PROMPT = """Sei un esperto analista di contenuti web. Rispondi SOLO con JSON valido.
+Per ogni pagina fornita produci un oggetto con questo formato:
+{
+    "keywords": ["keyword1", "keyword2", "keyword3"],
+    "description": "Breve descrizione del contenuto (max 200 caratteri)",
+    "relevance_score": 0.8,
+    "content_type": "article|product|service|homepage|about|contact|other",
+    "main_topics": ["topic1", "topic2"],
+    "language": "it|en|other",
+    "sentiment": "positive|negative|neutral",
+    "target_audience": "general|technical|business|educational",
+    "content_quality": "high|medium|low"
+}
+Se le pagine sono più di una, rispondi con {"analyses": [...]} contenente un oggetto per pagina nello stesso ordine.
+Estrai solo le informazioni più rilevanti e significative. Le parole chiave devono essere specifiche e utili per la ricerca."""
+
+
+# Budget del batch verso llama3-70b-8192 (contesto totale 8192 token):
+# con 4 pagine a chiamata, ~4000 caratteri di contenuto a pagina
+# (~1000 token) e 400 token di output a pagina input e output stanno
+# nel contesto con margine per system prompt e involucro JSON. Batch
+# piu' grandi venivano rifiutati dall'API e finivano tutti in fallback
+_BATCH_SIZE = 4
+_PAGE_CONTENT_CHARS = 4000
+_OUTPUT_TOKENS_PER_PAGE = 400
+
+# XPath dei contenitori principali, compilate una volta a livello di
+# modulo e provate in ordine di priorita'. Niente unione con [1]: su
+# un'unione il predicato sceglie in ordine di documento, e //body
+# precede sempre i propri discendenti, quindi vincerebbe su qualunque
+# <main> o <article>
+_MAIN_XPATHS = tuple(XPath(expr) for expr in (
+    '//main',
+    '//article',
+    "//*[@id='content']",
+    "//*[contains(@class, 'content')]",
+    '//body',
+))
+
+
+class Indexed(msgspec.Struct):
+    """
+    Risultato di indicizzazione di una pagina
+
+    Struct msgspec con slot: layout degli attributi fisso (niente dict
+    per istanza) e serializzazione JSON in C via msgspec.json
+    """
+    url: str = ''
+    title: str = ''
+    keywords: List[str] = []
+    description: str = ''
+    relevance_score: float = 0.0
+    content_type: str = 'other'
+    main_topics: List[str] = []
+    language: str = 'unknown'
+    sentiment: str = 'neutral'
+    target_audience: str = 'general'
+    content_quality: str = 'low'
+    internal_links: List[Dict] = []
+    indexed_at: str = ''
+    word_count: int = 0
+
 class WebIndexerBot:
-    def __init__(self, groq_api_key: str, max_concurrent: int = 5, max_links: int = 1, cooldown: float = 1.0):
+    def __init__(self, groq_api_key: str, max_concurrent: int = 5, max_links: int = 1,
+                 cooldown: float = 1.0, max_groq_concurrent: int = 2):
         """
         Inizializza il bot di indicizzazione web
-        
+
         Args:
             groq_api_key: Chiave API di Groq
-            max_concurrent: Numero massimo di richieste simultanee
+            max_concurrent: Numero massimo di richieste HTTP simultanee
             max_links: Numero massimo di link da analizzare per sessione
             cooldown: Tempo di attesa in secondi tra le richieste
+            max_groq_concurrent: Numero massimo di chiamate Groq in volo
         """
         self.groq_client = Groq(api_key=groq_api_key)
         self.max_concurrent = max_concurrent
+        self.max_groq_concurrent = max_groq_concurrent
         self.max_links = max_links
         self.cooldown = cooldown
         self.semaphore = asyncio.Semaphore(max_concurrent)
         self.results = []
         self.indexed_urls: Set[str] = set()  # Tracking URLs già indicizzati
-        
-    def load_existing_results(self, output_file: str) -> List[Dict]:
+        self._session: Optional[httpx.AsyncClient] = None
+        self._ckpt = None  # Writer append-only del checkpoint JSONL
+
+        # Pool dedicato alle chiamate Groq: dimensionato sul limite di
+        # chiamate concorrenti, cosi' gli RPC bloccanti non rubano thread
+        # al pool di default dell'event loop
+        self._groq_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_groq_concurrent, thread_name_prefix='groq'
+        )
+
+        # Cache hash contenuto -> analisi: i siti universitari replicano lo
+        # stesso boilerplate su migliaia di URL, e un hash a 64 bit costa
+        # nulla rispetto a una chiamata Groq per ogni duplicato
+        self._content_hashes: Dict[int, Dict] = {}
+
+        # Convertitore HTML -> markdown configurato una volta sola:
+        # html2text lavora sull'HTML serializzato senza riparsarlo con
+        # BeautifulSoup come faceva markdownify
+        self._h2t = html2text.HTML2Text()
+        self._h2t.ignore_images = True
+        self._h2t.body_width = 0
+
+    async def _get_session(self) -> httpx.AsyncClient:
+        """
+        Restituisce il client HTTP condiviso, creandolo al primo uso.
+        httpx con HTTP/2 multiplexa piu' richieste sulla stessa connessione
+        TLS: su un crawl a dominio singolo servono molte meno connessioni
+        (e handshake) rispetto a un pool HTTP/1.1
+        """
+        if self._session is None or self._session.is_closed:
+            self._session = httpx.AsyncClient(
+                http2=True,
+                headers=DEFAULT_HEADERS,
+                timeout=30,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_keepalive_connections=self.max_concurrent,
+                    max_connections=self.max_concurrent
+                )
+            )
+        return self._session
+
+    async def close(self):
+        """Chiude il client HTTP condiviso"""
+        if self._session is not None and not self._session.is_closed:
+            await self._session.aclose()
+
+    def load_existing_results(self, output_file: str) -> List[Indexed]:
         """
         Carica i risultati esistenti dal file JSON se esiste
         
@@ -48,69 +173,59 @@ class WebIndexerBot:
         Returns:
             Lista dei risultati esistenti
         """
-        if not os.path.exists(output_file):
-            logger.info(f"File {output_file} non esiste. Iniziando da zero.")
-            return []
-        
+        existing_results = []
         try:
-            with open(output_file, 'r', encoding='utf-8') as f:
-                existing_results = json.load(f)
-                
+            if os.path.exists(output_file):
+                with open(output_file, 'rb') as f:
+                    existing_results = msgspec.json.decode(f.read(), type=List[Indexed])
+
+            # Rigioca il checkpoint JSONL di una sessione interrotta
+            # (una riga per risultato, in ordine di completamento)
+            checkpoint_file = output_file.replace('.json', '_checkpoint.jsonl')
+            if os.path.exists(checkpoint_file):
+                with open(checkpoint_file, 'rb') as f:
+                    for line in f:
+                        if line.strip():
+                            existing_results.append(msgspec.json.decode(line, type=Indexed))
+
+            if not existing_results:
+                logger.info(f"File {output_file} non esiste. Iniziando da zero.")
+                return []
+
             # Estrai gli URL già indicizzati
             for result in existing_results:
-                if 'url' in result:
-                    self.indexed_urls.add(result['url'].strip())
-            
+                if result.url:
+                    self.indexed_urls.add(result.url.strip())
+
             logger.info(f"Caricati {len(existing_results)} risultati esistenti")
             logger.info(f"URLs già indicizzati: {len(self.indexed_urls)}")
-            
+
             return existing_results
-            
+
         except Exception as e:
             logger.error(f"Errore nel caricare il file esistente {output_file}: {str(e)}")
-            return []
-    
-    def find_last_indexed_position(self, csv_file_path: str, url_column: str = 'url') -> int:
-        """
-        Trova la posizione dell'ultimo URL indicizzato nel CSV
-        
-        Args:
-            csv_file_path: Percorso del file CSV
-            url_column: Nome della colonna contenente gli URL
-            
-        Returns:
-            Indice dell'ultimo URL indicizzato (-1 se nessuno trovato)
-        """
-        try:
-            df = pd.read_csv(csv_file_path)
-            urls = df[url_column].dropna().tolist()
-            
-            # Trova l'ultimo URL indicizzato
-            last_index = -1
-            for i, url in enumerate(urls):
-                if isinstance(url, str) and url.strip() in self.indexed_urls:
-                    last_index = i
-            
-            logger.info(f"Ultimo URL indicizzato trovato alla posizione: {last_index}")
-            return last_index
-            
-        except Exception as e:
-            logger.error(f"Errore nel trovare l'ultima posizione indicizzata: {str(e)}")
-            return -1
+            return existing_results
     
-    def save_progress_checkpoint(self, output_file: str, current_results: List[Dict]):
+    def save_progress_checkpoint(self, output_file: str, batch_results: List[Indexed]):
         """
-        Salva un checkpoint dei progressi durante l'elaborazione
-        
+        Accoda i risultati appena completati al checkpoint JSONL
+
+        Il checkpoint e' append-only (una riga JSON per risultato): la
+        scrittura costa O(1) per risultato invece di riscrivere l'intera
+        lista accumulata a ogni batch, che rendeva l'I/O quadratico in N
+
         Args:
             output_file: Percorso del file di output
-            current_results: Risultati correnti da salvare
+            batch_results: Risultati del batch appena completato
         """
-        checkpoint_file = output_file.replace('.json', '_checkpoint.json')
         try:
-            with open(checkpoint_file, 'w', encoding='utf-8') as f:
-                json.dump(current_results, f, indent=2, ensure_ascii=False)
-            logger.info(f"Checkpoint salvato: {len(current_results)} risultati")
+            if self._ckpt is None:
+                checkpoint_file = output_file.replace('.json', '_checkpoint.jsonl')
+                self._ckpt = open(checkpoint_file, 'ab')
+            for result in batch_results:
+                self._ckpt.write(msgspec.json.encode(result) + b'\n')
+            self._ckpt.flush()
+            logger.info(f"Checkpoint aggiornato: +{len(batch_results)} risultati")
         except Exception as e:
             logger.error(f"Errore nel salvare checkpoint: {str(e)}")
 
@@ -125,66 +240,55 @@ class WebIndexerBot:
             Dizionario con contenuto pulito o None se errore
         """
         try:
-            # Headers per sembrare un browser normale
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'it-IT,it;q=0.9,en;q=0.8',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1'
-            }
-            
-            # Fai la richiesta HTTP
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status != 200:
-                        logger.error(f"HTTP {response.status} per {url}")
-                        return None
-                    
-                    html_content = await response.text()
-            
-            # Parsifica con BeautifulSoup
-            soup = BeautifulSoup(html_content, 'html.parser')
+            # Fai la richiesta HTTP sul client condiviso
+            session = await self._get_session()
+            response = await session.get(url)
+            if response.status_code != 200:
+                logger.error(f"HTTP {response.status_code} per {url}")
+                return None
+
+            html_content = response.text
             
+            # Un solo parse lxml: rimozione dei tag inutili, titolo,
+            # scelta del contenitore principale e serializzazione lavorano
+            # tutti sullo stesso albero costruito in C
+            tree = lxml.html.fromstring(html_content)
+
             # Rimuovi script, style e altri elementi non necessari
-            for script in soup(["script", "style", "nav", "header", "footer", "aside", "noscript"]):
-                script.decompose()
-            
+            strip_elements(tree, 'script', 'style', 'nav', 'header',
+                           'footer', 'aside', 'noscript', with_tail=False)
+
             # Estrai il titolo
-            title = soup.find('title')
-            title_text = title.get_text().strip() if title else ''
-            
-            # Estrai il contenuto principale
-            # Cerca prima contenitori comuni per il contenuto principale
+            title_text = (tree.findtext('.//title') or '').strip()
+
+            # Estrai il contenuto principale: XPath precompilate provate
+            # in ordine di priorita', con ricaduta sul body solo quando
+            # nessun contenitore specifico esiste
             main_content = None
-            for selector in ['main', 'article', '.content', '#content', '.main-content', '.post-content']:
-                main_content = soup.select_one(selector)
-                if main_content:
+            for xpath in _MAIN_XPATHS:
+                candidates = xpath(tree)
+                if candidates:
+                    main_content = candidates[0]
                     break
-            
-            # Se non trova un contenitore principale, usa il body
-            if not main_content:
-                main_content = soup.find('body')
-            
-            if not main_content:
+            if main_content is None:
                 logger.error(f"Nessun contenuto trovato per {url}")
                 return None
+
+            # Converti in markdown (serializzazione C del sottoalbero)
+            markdown_content = self._h2t.handle(lxml.html.tostring(main_content, encoding='unicode'))
             
-            # Converti in markdown
-            markdown_content = md(str(main_content))
-            
-            # Pulisci il markdown
-            markdown_content = re.sub(r'\n\s*\n', '\n\n', markdown_content)  # Rimuovi righe vuote eccessive
-            markdown_content = re.sub(r'\s+', ' ', markdown_content)  # Normalizza spazi
+            # Pulisci il markdown: split/join normalizza tutti gli spazi
+            # in un unico passaggio C, senza la VM delle regex (e rende
+            # superflua la vecchia passata sulle righe vuote)
+            markdown_content = ' '.join(markdown_content.split())
             
             # Estrai i link interni
             internal_links = []
             base_domain = urlparse(url).netloc
             
-            for link in main_content.find_all('a', href=True):
+            for link in main_content.iter('a'):
                 href = link.get('href')
-                text = link.get_text().strip()
+                text = link.text_content().strip()
                 
                 if href and text:
                     # Converti link relativi in assoluti
@@ -202,6 +306,7 @@ class WebIndexerBot:
                 'url': url,
                 'title': title_text,
                 'markdown_content': markdown_content[:8000] if markdown_content else '',  # Limita a 8k caratteri
+                'content_hash': xxhash.xxh64_intdigest(markdown_content[:4000].encode()),
                 'internal_links': internal_links[:20],  # Limita a 20 link
                 'extraction_time': datetime.now().isoformat(),
                 'success': True
@@ -211,150 +316,108 @@ class WebIndexerBot:
             logger.error(f"Errore durante l'estrazione da {url}: {str(e)}")
             return None
     
-    def analyze_with_groq(self, content_data: Dict) -> Dict:
+    def analyze_batch_with_groq(self, items: List[Dict]) -> List[Optional[Dict]]:
         """
-        Analizza il contenuto con Groq AI per estrarre informazioni strutturate
-        
+        Analizza un batch di contenuti con una sola chiamata Groq
+
+        Una richiesta per K pagine ammortizza il round trip dell'API
+        (centinaia di ms a chiamata) su tutto il batch. Il contenuto di
+        ogni pagina e' tagliato a _PAGE_CONTENT_CHARS cosi' input e
+        output del batch stanno nel contesto del modello
+
         Args:
-            content_data: Dati del contenuto estratto
-            
+            items: Lista di dati contenuto estratti
+
         Returns:
-            Dizionario con analisi strutturata
+            Lista di analisi, allineata a items (None sulle mancanti,
+            che restano da ritentare)
         """
-        try:
-            # Prepara il prompt per Groq
-            prompt = f"""
-Analizza il seguente contenuto web e fornisci una risposta in formato JSON con le seguenti informazioni:
+        if not items:
+            return []
 
-URL: {content_data['url']}
-Titolo: {content_data['title']}
-Contenuto: {content_data['markdown_content']}
+        analyses = []
+        try:
+            # Solo il payload variabile: il template sta in _SYSTEM_PROMPT
+            payload = orjson.dumps({
+                'pages': [
+                    {
+                        'url': content_data['url'],
+                        'title': content_data['title'],
+                        'content': content_data['markdown_content'][:_PAGE_CONTENT_CHARS]
+                    }
+                    for content_data in items
+                ]
+            }).decode()
 
-Fornisci la risposta in questo formato JSON:
-{{
-    "keywords": ["keyword1", "keyword2", "keyword3"],
-    "description": "Breve descrizione del contenuto (max 200 caratteri)",
-    "relevance_score": 0.8,
-    "content_type": "article|product|service|homepage|about|contact|other",
-    "main_topics": ["topic1", "topic2"],
-    "language": "it|en|other",
-    "sentiment": "positive|negative|neutral",
-    "target_audience": "general|technical|business|educational",
-    "content_quality": "high|medium|low"
-}}
-
-Estrai solo le informazioni più rilevanti e significative. Le parole chiave devono essere specifiche e utili per la ricerca.
-"""
-
-            # Salva il contenuto del primo link per debug
-            if not hasattr(self, 'first_link_debug_content'):
-                self.first_link_debug_content = {
-                    'url': content_data['url'],
-                    'title': content_data['title'],
-                    'markdown_content': content_data['markdown_content'],
-                    'prompt_sent_to_ai': prompt,
-                    'extraction_time': content_data['extraction_time']
-                }
-
-            # Chiamata a Groq
+            # Chiamata a Groq in JSON mode (una per tutto il batch)
             response = self.groq_client.chat.completions.create(
                 model="llama3-70b-8192",
                 messages=[
-                    {"role": "system", "content": "Sei un esperto analista di contenuti web. Rispondi sempre in formato JSON valido."},
-                    {"role": "user", "content": prompt}
+                    {"role": "system", "content": _SYSTEM_PROMPT},
+                    {"role": "user", "content": payload}
                 ],
-                temperature=0.3,
-                max_tokens=500
+                response_format={"type": "json_object"},
+                temperature=0.1,
+                max_tokens=_OUTPUT_TOKENS_PER_PAGE * len(items)
             )
-            
-            # Estrai la risposta JSON
+
             response_text = response.choices[0].message.content.strip()
-            
-            # Salva anche la risposta dell'AI per il primo link
-            if hasattr(self, 'first_link_debug_content') and 'ai_response' not in self.first_link_debug_content:
-                self.first_link_debug_content['ai_response'] = response_text
-            
-            # Cerca di estrarre JSON dalla risposta
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                analysis = json.loads(json_str)
-            else:
-                # Fallback se non trova JSON
-                analysis = {
-                    "keywords": [],
-                    "description": "Contenuto non analizzabile",
-                    "relevance_score": 0.1,
-                    "content_type": "other",
-                    "main_topics": [],
-                    "language": "unknown",
-                    "sentiment": "neutral",
-                    "target_audience": "general",
-                    "content_quality": "low"
-                }
-            
-            return analysis
-            
+
+            # In JSON mode la risposta e' sempre un oggetto valido:
+            # {"analyses": [...]} per i batch, un oggetto per pagina singola
+            parsed = json.loads(response_text)
+            if isinstance(parsed, dict) and isinstance(parsed.get('analyses'), list):
+                analyses = parsed['analyses']
+            elif isinstance(parsed, dict) and len(items) == 1:
+                analyses = [parsed]
+
         except Exception as e:
-            logger.error(f"Errore nell'analisi Groq per {content_data['url']}: {str(e)}")
-            return {
-                "keywords": [],
-                "description": "Errore nell'analisi",
-                "relevance_score": 0.0,
-                "content_type": "other",
-                "main_topics": [],
-                "language": "unknown",
-                "sentiment": "neutral",
-                "target_audience": "general",
-                "content_quality": "low"
-            }
-    
-    async def process_url(self, url: str) -> Optional[Dict]:
+            logger.error(f"Errore nell'analisi Groq del batch: {str(e)}")
+
+        # Allinea la lista agli item: None sulle mancanti, cosi' il
+        # chiamante non indicizza (e non checkpointa) analisi fasulle
+        while len(analyses) < len(items):
+            analyses.append(None)
+        return analyses[:len(items)]
+
+    async def extract_only(self, url: str) -> Optional[Dict]:
         """
-        Processa un singolo URL: estrae contenuto e analizza con AI
-        
+        Estrae il contenuto di un URL rispettando semaforo e cooldown
+
         Args:
             url: URL da processare
-            
+
         Returns:
-            Dizionario con tutti i dati processati
+            Dati del contenuto estratto o None se errore
         """
         async with self.semaphore:  # Limita le richieste concorrenti
-            logger.info(f"Processando: {url}")
-            
-            # Estrai contenuto pulito
+            logger.info(f"Estraendo: {url}")
             content_data = await self.extract_clean_content(url)
-            if not content_data:
-                return None
-            
+
             # Cooldown tra le richieste
             await asyncio.sleep(self.cooldown)
-            
-            # Analizza con Groq (operazione sincrona)
-            analysis = self.analyze_with_groq(content_data)
-            
-            # Combina tutti i dati
-            result = {
-                "url": url,
-                "title": content_data["title"],
-                "keywords": analysis["keywords"],
-                "description": analysis["description"],
-                "relevance_score": analysis["relevance_score"],
-                "content_type": analysis["content_type"],
-                "main_topics": analysis["main_topics"],
-                "language": analysis["language"],
-                "sentiment": analysis["sentiment"],
-                "target_audience": analysis["target_audience"],
-                "content_quality": analysis["content_quality"],
-                "internal_links": content_data["internal_links"],
-                "indexed_at": datetime.now().isoformat(),
-                "word_count": len(content_data["markdown_content"].split()) if content_data["markdown_content"] else 0
-            }
-            
-            logger.info(f"Completato: {url}")
-            return result
+            return content_data
+
+    def _build_result(self, content_data: Dict, analysis: Dict) -> Indexed:
+        """Combina contenuto estratto e analisi AI in un risultato indicizzato"""
+        return Indexed(
+            url=content_data["url"],
+            title=content_data["title"],
+            keywords=analysis["keywords"],
+            description=analysis["description"],
+            relevance_score=analysis["relevance_score"],
+            content_type=analysis["content_type"],
+            main_topics=analysis["main_topics"],
+            language=analysis["language"],
+            sentiment=analysis["sentiment"],
+            target_audience=analysis["target_audience"],
+            content_quality=analysis["content_quality"],
+            internal_links=content_data["internal_links"],
+            indexed_at=datetime.now().isoformat(),
+            word_count=len(content_data["markdown_content"].split()) if content_data["markdown_content"] else 0
+        )
     
-    async def process_csv_file(self, csv_file_path: str, output_file: str, url_column: str = 'url') -> List[Dict]:
+    async def process_csv_file(self, csv_file_path: str, output_file: str, url_column: str = 'url') -> List[Indexed]:
         """
         Processa tutti gli URL da un file CSV, riprendendo dall'ultimo punto
         
@@ -373,20 +436,23 @@ Estrai solo le informazioni più rilevanti e significative. Le parole chiave dev
         
         # Leggi il CSV
         try:
-            df = pd.read_csv(csv_file_path)
-            urls = df[url_column].dropna().tolist()
+            # Il CSV ha solo colonne testuali: csv.DictReader legge in
+            # streaming la sola colonna che serve, senza l'inferenza dei
+            # tipi e le allocazioni colonnari di pandas
+            with open(csv_file_path, newline='', encoding='utf-8') as f:
+                urls = [row[url_column] for row in csv.DictReader(f) if row.get(url_column)]
             logger.info(f"Trovati {len(urls)} URLs totali nel CSV")
-            
-            # Trova la posizione di partenza
-            last_index = self.find_last_indexed_position(csv_file_path, url_column)
-            start_index = last_index + 1
-            
-            # Estrai solo gli URL non ancora processati
-            remaining_urls = []
-            for i, url in enumerate(urls[start_index:], start_index):
-                if url and isinstance(url, str) and url.strip() not in self.indexed_urls:
-                    remaining_urls.append((i, url.strip()))
-            
+
+            # Estrai gli URL non ancora processati in un solo passaggio:
+            # lo strip e' calcolato una volta per URL e la membership sul
+            # set degli indicizzati e' O(1), senza la scansione preliminare
+            # della "ultima posizione" (ridondante con questo filtro)
+            remaining_urls = [
+                (i, s) for i, url in enumerate(urls)
+                if isinstance(url, str) and (s := url.strip())
+                and s not in self.indexed_urls
+            ]
+
             logger.info(f"URLs rimanenti da processare: {len(remaining_urls)}")
             
             # Limita il numero di URL da processare in questa sessione
@@ -402,41 +468,107 @@ Estrai solo le informazioni più rilevanti e significative. Le parole chiave dev
             logger.error(f"Errore nel leggere il CSV: {str(e)}")
             return existing_results
         
-        # Processa gli URL rimanenti
-        tasks = []
-        for position, url in remaining_urls:
-            logger.info(f"Aggiungendo alla coda (posizione CSV {position}): {url}")
-            task = self.process_url(url)
-            tasks.append(task)
-        
-        # Esegui tutte le task con checkpoint periodici
-        logger.info(f"Iniziando elaborazione di {len(tasks)} URLs...")
+        # Pipeline produttore-consumatore: i worker di fetch estraggono i
+        # contenuti in una coda limitata, i worker Groq li consumano a
+        # batch. I due stadi hanno colli di bottiglia indipendenti (server
+        # HTML vs API Groq) e cosi' si sovrappongono invece di alternarsi
+        logger.info(f"Iniziando elaborazione di {len(remaining_urls)} URLs...")
         new_results = []
         all_results = existing_results.copy()
-        
-        # Processa in batch con checkpoint
-        batch_size = min(10, len(tasks))
-        for i in range(0, len(tasks), batch_size):
-            batch_tasks = tasks[i:i + batch_size]
-            batch_results = await asyncio.gather(*batch_tasks, return_exceptions=True)
-            
-            # Processa risultati del batch
-            for result in batch_results:
-                if isinstance(result, dict) and result is not None:
-                    new_results.append(result)
-                    all_results.append(result)
-                    self.indexed_urls.add(result['url'])
-                elif isinstance(result, Exception):
-                    logger.error(f"Errore durante il processing: {str(result)}")
-            
-            # Salva checkpoint
-            if new_results:
-                self.save_progress_checkpoint(output_file, all_results)
-            
-            logger.info(f"Batch completato. Nuovi risultati: {len(new_results)}, Totale: {len(all_results)}")
+
+        url_queue: asyncio.Queue = asyncio.Queue()
+        fetch_queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+        for position, url in remaining_urls:
+            url_queue.put_nowait((position, url))
+
+        batch_size = _BATCH_SIZE
+
+        async def fetch_worker():
+            while True:
+                position, url = await url_queue.get()
+                try:
+                    logger.info(f"Estraendo (posizione CSV {position}): {url}")
+                    content_data = await self.extract_only(url)
+                    if content_data:
+                        await fetch_queue.put(content_data)
+                except Exception as e:
+                    logger.error(f"Errore durante il processing: {str(e)}")
+                finally:
+                    url_queue.task_done()
+
+        async def groq_worker():
+            while True:
+                batch = [await fetch_queue.get()]
+                # Svuota opportunisticamente la coda fino a batch_size,
+                # per ammortizzare il round trip Groq sul batch
+                while len(batch) < batch_size:
+                    try:
+                        batch.append(fetch_queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+                try:
+                    # Dedup per hash del contenuto: le pagine con markdown
+                    # identico riusano l'analisi gia' pagata
+                    cached, to_analyze = [], []
+                    for content_data in batch:
+                        hit = self._content_hashes.get(content_data['content_hash'])
+                        if hit is not None:
+                            cached.append((content_data, hit))
+                        else:
+                            to_analyze.append(content_data)
+
+                    analyses = []
+                    if to_analyze:
+                        analyses = await asyncio.get_running_loop().run_in_executor(
+                            self._groq_pool, self.analyze_batch_with_groq, to_analyze
+                        )
+                        for content_data, analysis in zip(to_analyze, analyses):
+                            if analysis is not None:
+                                self._content_hashes[content_data['content_hash']] = analysis
+                    if cached:
+                        logger.info(f"Riusate {len(cached)} analisi da contenuti duplicati")
+
+                    batch_built = []
+                    skipped = 0
+                    for content_data, analysis in list(zip(to_analyze, analyses)) + cached:
+                        if analysis is None:
+                            # Analisi fallita: niente risultato fallback nel
+                            # checkpoint ne' in indexed_urls, cosi' l'URL
+                            # viene ritentato alla prossima sessione
+                            skipped += 1
+                            continue
+                        result = self._build_result(content_data, analysis)
+                        new_results.append(result)
+                        all_results.append(result)
+                        batch_built.append(result)
+                        self.indexed_urls.add(result.url)
+
+                    if skipped:
+                        logger.warning(f"{skipped} pagine senza analisi nel batch: verranno ritentate")
+
+                    # Accoda il batch al checkpoint (append-only)
+                    self.save_progress_checkpoint(output_file, batch_built)
+                    logger.info(f"Batch completato. Nuovi risultati: {len(new_results)}, Totale: {len(all_results)}")
+                except Exception as e:
+                    logger.error(f"Errore durante l'analisi del batch: {str(e)}")
+                finally:
+                    for _ in batch:
+                        fetch_queue.task_done()
+
+        fetchers = [asyncio.create_task(fetch_worker()) for _ in range(self.max_concurrent)]
+        groqers = [asyncio.create_task(groq_worker()) for _ in range(self.max_groq_concurrent)]
+
+        await url_queue.join()
+        await fetch_queue.join()
+        for worker in fetchers + groqers:
+            worker.cancel()
+        await asyncio.gather(*fetchers, *groqers, return_exceptions=True)
         
         self.results = all_results
         logger.info(f"Elaborazione completata. Nuovi risultati: {len(new_results)}, Totale: {len(all_results)}")
+
+        # Chiudi la sessione HTTP condivisa a fine elaborazione
+        await self.close()
         return all_results
     
     def save_to_json(self, output_file: str, pretty_print: bool = True):
@@ -448,17 +580,20 @@ Estrai solo le informazioni più rilevanti e significative. Le parole chiave dev
             pretty_print: Se formattare il JSON in modo leggibile
         """
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                if pretty_print:
-                    json.dump(self.results, f, indent=2, ensure_ascii=False)
-                else:
-                    json.dump(self.results, f, ensure_ascii=False)
-            
+            data = msgspec.json.encode(self.results)
+            if pretty_print:
+                data = msgspec.json.format(data, indent=2)
+            with open(output_file, 'wb') as f:
+                f.write(data)
+
             logger.info(f"Risultati salvati in {output_file}")
             logger.info(f"Totale pagine indicizzate: {len(self.results)}")
             
-            # Rimuovi il file checkpoint se esiste
-            checkpoint_file = output_file.replace('.json', '_checkpoint.json')
+            # Chiudi e rimuovi il checkpoint JSONL se esiste
+            if self._ckpt is not None:
+                self._ckpt.close()
+                self._ckpt = None
+            checkpoint_file = output_file.replace('.json', '_checkpoint.jsonl')
             if os.path.exists(checkpoint_file):
                 os.remove(checkpoint_file)
                 logger.info("File checkpoint rimosso dopo salvataggio finale")
@@ -484,18 +619,18 @@ Estrai solo le informazioni più rilevanti e significative. Le parole chiave dev
         
         for result in self.results:
             # Conta i tipi di contenuto
-            content_type = result.get('content_type', 'unknown')
+            content_type = result.content_type or 'unknown'
             content_types[content_type] = content_types.get(content_type, 0) + 1
-            
+
             # Conta le lingue
-            language = result.get('language', 'unknown')
+            language = result.language or 'unknown'
             languages[language] = languages.get(language, 0) + 1
-            
+
             # Calcola rilevanza media
-            avg_relevance += result.get('relevance_score', 0)
-            
+            avg_relevance += result.relevance_score
+
             # Distribuzione qualità
-            quality = result.get('content_quality', 'unknown')
+            quality = result.content_quality or 'unknown'
             quality_distribution[quality] = quality_distribution.get(quality, 0) + 1
         
         avg_relevance = avg_relevance / total_pages if total_pages > 0 else 0
@@ -509,11 +644,7 @@ Estrai solo le informazioni più rilevanti e significative. Le parole chiave dev
             'generated_at': datetime.now().isoformat(),
             'total_indexed_urls': len(self.indexed_urls)
         }
-        
-        # Aggiungi il contenuto del primo link per debug
-        if self.results and hasattr(self, 'first_link_debug_content'):
-            stats['first_link_debug'] = self.first_link_debug_content
-        
+
         return stats
 
 
@@ -541,8 +672,8 @@ async def main():
     
     # Genera e salva statistiche
     stats = bot.get_statistics()
-    with open(STATS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(stats, f, indent=2, ensure_ascii=False)
+    with open(STATS_FILE, 'wb') as f:
+        f.write(orjson.dumps(stats, option=orjson.OPT_INDENT_2))
     
     print(f"Indicizzazione completata!")
     print(f"Pagine totali nel database: {len(results)}")